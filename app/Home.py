@@ -1,3 +1,4 @@
+import numbers
 import sys
 from pathlib import Path
 import streamlit as st
@@ -45,7 +46,7 @@ with col3:
     st.metric("Clusters (k selected)", k_selected)
 with col4:
     sil = clustered["silhouette_score_selected"].iloc[0] if "silhouette_score_selected" in clustered and not clustered.empty else "N/A"
-    st.metric("Silhouette score", f"{sil:.3f}" if isinstance(sil, (int, float)) else sil)
+    st.metric("Silhouette score", f"{sil:.3f}" if isinstance(sil, numbers.Real) else sil)
 
 st.markdown("""
 **Navigation guidance**
@@ -1,7 +1,9 @@
 import sys
 from pathlib import Path
 import streamlit as st
+import numpy as np
 import plotly.express as px
+import plotly.graph_objects as go
 import pandas as pd
 
 # Ensure project root is on path when running via `streamlit run`
@@ -9,65 +11,58 @@ ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.append(str(ROOT))
 
-from app.utils import load_csv, add_geometry_type, sidebar_filters_common, format_large_number  # noqa: E402
+from app.utils import load_csv, query_hotspots, sidebar_filters_common, format_large_number  # noqa: E402
 
 
 st.set_page_config(page_title="Global Overview", layout="wide")
 st.title("Global Hotspot Overview")
 
 data_dir = Path("outputs/tables")
-global_df = load_csv(str(data_dir / "hotspots_priority_global.csv"))
-clustered_df = load_csv(str(data_dir / "hotspots_clustered.csv"))
+global_csv = str(data_dir / "hotspots_priority_global_with_cluster.csv")
+global_df = load_csv(global_csv)
 
 if global_df.empty:
-    st.warning("Global priority file not found. Generate outputs/tables/hotspots_priority_global.csv and retry.")
+    st.warning("Global priority file not found. Generate outputs/tables/hotspots_priority_global_with_cluster.csv and retry.")
     st.stop()
 
-# Merge cluster labels if not present
-if "cluster_label" not in global_df.columns and not clustered_df.empty:
-    merged = pd.merge(
-        global_df,
-        clustered_df[["iso3_country", "geometry_ref", "cluster_label"]],
-        on=["iso3_country", "geometry_ref"],
-        how="left",
-    )
-else:
-    merged = global_df.copy()
-
-merged = add_geometry_type(merged)
+filters = sidebar_filters_common(global_csv)
 
-filters = sidebar_filters_common(merged)
-
-df = merged.copy()
-if filters["country"]:
-    df = df[df["iso3_country"] == filters["country"]]
-if filters["clusters"]:
-    df = df[df["cluster_label"].isin(filters["clusters"])]
-if filters["geometry_types"]:
-    df = df[df["geometry_type"].isin(filters["geometry_types"])]
-res_min, res_max = filters["res_range"]
-df = df[(df["res_share"] >= res_min) & (df["res_share"] <= res_max)]
+# Filter and sort in a single DuckDB pass (cached on the filter values)
+df = query_hotspots(
+    global_csv,
+    country=filters["country"],
+    clusters=tuple(filters["clusters"]),
+    geometry_types=tuple(filters["geometry_types"]),
+    res_range=filters["res_range"],
+)
 
 top_n = filters["top_n"]
-df_top = df.sort_values("priority_score", ascending=False).head(top_n)
+df_top = df.head(top_n)
+
+# Aggregate the filtered view once; KPIs and charts reuse these
+# (emissions are stored as float32; accumulate in float64 for the totals)
+emissions = df["combined_emissions"].astype(np.float64)
+gb_country = emissions.groupby(df["iso3_country"], observed=True, sort=False).sum()
+total_emissions = gb_country.sum()
+gb_cluster = (
+    emissions.groupby(df["cluster_label"], observed=True, sort=False).sum()
+    if "cluster_label" in df.columns
+    else pd.Series(dtype=float)
+)
 
 # KPIs
 col1, col2, col3, col4 = st.columns(4)
 with col1:
-    st.metric("Total emissions (filtered)", format_large_number(df["combined_emissions"].sum()))
+    st.metric("Total emissions (filtered)", format_large_number(total_emissions))
 with col2:
     st.metric("Avg residential share", f"{df['res_share'].mean():.2f}" if not df.empty else "-")
 with col3:
-    st.metric("Countries in view", format_large_number(df["iso3_country"].nunique()))
+    st.metric("Countries in view", format_large_number(len(gb_country)))
 with col4:
-    if "cluster_label" in df.columns and not df.empty:
-        cluster_by_em = df.groupby("cluster_label")["combined_emissions"].sum()
-        if not cluster_by_em.empty:
-            top_cluster = cluster_by_em.sort_values(ascending=False).index[0]
-            share = cluster_by_em.iloc[0] / max(df["combined_emissions"].sum(), 1e-9)
-            st.metric(f"Emissions share ({top_cluster})", f"{share:.2%}")
-        else:
-            st.metric("Emissions share (top cluster)", "-")
+    if not gb_cluster.empty:
+        top_cluster = gb_cluster.idxmax()
+        share = gb_cluster.max() / max(total_emissions, 1e-9)
+        st.metric(f"Emissions share ({top_cluster})", f"{share:.2%}")
     else:
         st.metric("Emissions share (top cluster)", "-")
 
@@ -91,7 +86,7 @@ if not chart_top.empty:
                  title="Top 10 hotspots by combined emissions")
     st.plotly_chart(fig, use_container_width=True)
 
-country_em = df.groupby("iso3_country")["combined_emissions"].sum().reset_index().sort_values("combined_emissions", ascending=False).head(10)
+country_em = gb_country.nlargest(10).reset_index()
 if not country_em.empty:
     fig_country = px.bar(country_em, x="iso3_country", y="combined_emissions",
                          title="Top countries by combined emissions (filtered)")
@@ -99,5 +94,12 @@ if not country_em.empty:
 
 hist_data = df["res_share"].dropna()
 if not hist_data.empty:
-    fig_hist = px.histogram(hist_data, nbins=20, title="Residential share distribution")
+    # Bin server-side so the browser gets 20 bars rather than every hotspot
+    counts, edges = np.histogram(hist_data.to_numpy(), bins=20)
+    fig_hist = go.Figure(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges)))
+    fig_hist.update_layout(
+        title="Residential share distribution",
+        xaxis_title="res_share",
+        yaxis_title="count",
+    )
     st.plotly_chart(fig_hist, use_container_width=True)
@@ -1,8 +1,8 @@
 import sys
 from pathlib import Path
+import numpy as np
 import streamlit as st
 import plotly.express as px
-import pandas as pd
 
 # Ensure project root is on path when running via `streamlit run`
 ROOT = Path(__file__).resolve().parents[1]
@@ -16,22 +16,12 @@ st.set_page_config(page_title="Country Drilldown", layout="wide")
 st.title("Country Drilldown")
 
 data_dir = Path("outputs/tables")
-country_df = load_csv(str(data_dir / "hotspots_priority_by_country.csv"))
-clustered_df = load_csv(str(data_dir / "hotspots_clustered.csv"))
+country_df = load_csv(str(data_dir / "hotspots_priority_by_country_with_cluster.csv"))
 
 if country_df.empty:
-    st.warning("Country priority file not found. Generate outputs/tables/hotspots_priority_by_country.csv and retry.")
+    st.warning("Country priority file not found. Generate outputs/tables/hotspots_priority_by_country_with_cluster.csv and retry.")
     st.stop()
 
-# Merge cluster labels if available
-if "cluster_label" not in country_df.columns and not clustered_df.empty:
-    country_df = pd.merge(
-        country_df,
-        clustered_df[["iso3_country", "geometry_ref", "cluster_label"]],
-        on=["iso3_country", "geometry_ref"],
-        how="left",
-    )
-
 country_df = add_geometry_type(country_df)
 
 countries = sorted(country_df["iso3_country"].dropna().unique())
@@ -45,16 +35,18 @@ top_k = st.sidebar.slider("Top K", 5, 200, 20)
 geometry_types = sorted(country_df["geometry_type"].dropna().unique())
 geom_choice = st.sidebar.multiselect("Geometry type", geometry_types, default=geometry_types)
 
-df = country_df[country_df["iso3_country"] == country]
+# Fuse the filters into one query (evaluated with numexpr when it is installed)
+conditions = ["iso3_country == @country"]
 if geom_choice:
-    df = df[df["geometry_type"].isin(geom_choice)]
+    conditions.append("geometry_type in @geom_choice")
+df = country_df.query(" and ".join(conditions))
 
-df = df.sort_values(rank_mode, ascending=False).head(top_k)
+df = df.nlargest(top_k, rank_mode)
 
 # KPIs
 col1, col2, col3, col4 = st.columns(4)
 with col1:
-    st.metric("Total combined emissions", format_large_number(df["combined_emissions"].sum()))
+    st.metric("Total combined emissions", format_large_number(df["combined_emissions"].astype(np.float64).sum()))
 with col2:
     st.metric("Mean residential share", f"{df['res_share'].mean():.2f}" if not df.empty else "-")
 with col3:
@@ -92,6 +84,8 @@ if not df.empty:
     st.plotly_chart(bar_combined, use_container_width=True)
 
     if "cluster_label" in df.columns:
-        cluster_counts = df.groupby("cluster_label")["geometry_ref"].count().reset_index(name="count")
+        # Counts on the category codes; drop labels that are absent from this view
+        cluster_counts = df["cluster_label"].value_counts(sort=False)
+        cluster_counts = cluster_counts[cluster_counts > 0].rename_axis("cluster_label").reset_index(name="count")
         fig_cluster = px.bar(cluster_counts, x="cluster_label", y="count", title="Cluster composition (count)")
         st.plotly_chart(fig_cluster, use_container_width=True)
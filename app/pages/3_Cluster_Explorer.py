@@ -2,6 +2,7 @@ import sys
 from pathlib import Path
 import streamlit as st
 import plotly.express as px
+import plotly.graph_objects as go
 
 # Ensure project root is on path when running via `streamlit run`
 ROOT = Path(__file__).resolve().parents[1]
@@ -60,13 +61,12 @@ fig_share = px.bar(
 )
 st.plotly_chart(fig_share, use_container_width=True)
 
-filtered = clustered_df.copy()
-if country_filter:
-    filtered = filtered[filtered["iso3_country"].isin(country_filter)]
-
+# Combine the filters into one mask; indexing with it already yields a new frame
 cluster_col = "cluster_label" if "cluster_label" in clustered_df.columns else "cluster_id"
-filtered = filtered[filtered[cluster_col] == selected_cluster]
-filtered = filtered.sort_values("combined_emissions", ascending=False).head(top_n)
+mask = clustered_df[cluster_col] == selected_cluster
+if country_filter:
+    mask &= clustered_df["iso3_country"].isin(country_filter)
+filtered = clustered_df[mask].nlargest(top_n, "combined_emissions")
 
 if not filtered.empty:
     st.subheader(f"Top {len(filtered)} hotspots in cluster")
@@ -81,7 +81,21 @@ if not filtered.empty:
         cols.append("priority_rank_global")
     st.dataframe(filtered[cols], use_container_width=True)
 
-    fig_box = px.box(clustered_df, x=cluster_col, y="combined_emissions", title="Combined emissions by cluster")
+    # Send per-cluster quartiles (whiskers at min/max) instead of every hotspot to the browser
+    box_stats = clustered_df.groupby(cluster_col, observed=True)["combined_emissions"].describe()
+    fig_box = go.Figure(go.Box(
+        x=box_stats.index.astype(str).tolist(),
+        lowerfence=box_stats["min"],
+        q1=box_stats["25%"],
+        median=box_stats["50%"],
+        q3=box_stats["75%"],
+        upperfence=box_stats["max"],
+    ))
+    fig_box.update_layout(
+        title="Combined emissions by cluster",
+        xaxis_title=cluster_col,
+        yaxis_title="combined_emissions",
+    )
     st.plotly_chart(fig_box, use_container_width=True)
 
 # Recommended strategy text
@@ -1,12 +1,108 @@
+import math
+import tempfile
+from pathlib import Path
+from typing import Optional, Tuple
+import duckdb
+import numpy as np
 import streamlit as st
 import pandas as pd
 
+# Low-cardinality label columns; category dtype shrinks memory and speeds up groupby/isin
+CATEGORICAL_COLUMNS = ("iso3_country", "cluster_label", "geometry_type")
+
+# geometry_ref prefix -> geometry type; anything else is OTHER_GEOMETRY_TYPE
+GEOMETRY_TYPES = (
+    ("ghs-fua", "Urban area (FUA)"),
+    ("gadm", "Administrative region (GADM)"),
+)
+OTHER_GEOMETRY_TYPE = "Other/Unknown"
+
+# KPI magnitude suffixes, indexed by floor(log10(x) / 3)
+_SCALES = (1.0, 1e3, 1e6, 1e9)
+_SUFFIXES = ("", "K", "M", "B")
+
+_GEOMETRY_TYPE_SQL = "CASE {} ELSE '{}' END".format(
+    " ".join(f"WHEN starts_with(geometry_ref, '{prefix}') THEN '{label}'" for prefix, label in GEOMETRY_TYPES),
+    OTHER_GEOMETRY_TYPE,
+)
+
+
+def _parquet_copy(csv_path: Path) -> Optional[Path]:
+    """Parquet copy of a CSV, (re)written when missing or older than the CSV.
+
+    Returns None when the copy cannot be written (e.g. read-only outputs folder, or a
+    mixed-type column Arrow cannot convert); callers then read the CSV directly.
+    """
+    pq_path = csv_path.with_suffix(".parquet")
+    if pq_path.exists() and pq_path.stat().st_mtime >= csv_path.stat().st_mtime:
+        return pq_path
+
+    # Unique temp file per writer: concurrent sessions never share (and publish) a partial file
+    try:
+        with tempfile.NamedTemporaryFile(
+            dir=pq_path.parent, prefix=f"{pq_path.name}.", suffix=".tmp", delete=False
+        ) as tmp:
+            tmp_path = Path(tmp.name)
+    except OSError:
+        return None
+    try:
+        pd.read_csv(csv_path).to_parquet(tmp_path, index=False)
+        tmp_path.replace(pq_path)
+    except FileNotFoundError:
+        raise
+    except Exception:  # noqa: BLE001 - e.g. ArrowInvalid; the copy is only a cache
+        return None
+    finally:
+        tmp_path.unlink(missing_ok=True)  # no-op once replaced
+    return pq_path
+
+
+def _read_via_parquet(csv_path: Path) -> pd.DataFrame:
+    pq_path = _parquet_copy(csv_path)
+    return pd.read_parquet(pq_path) if pq_path else pd.read_csv(csv_path)
+
+
+def _scan_sql(csv_path: Path) -> Tuple[str, str]:
+    """DuckDB table function and its path argument for reading a CSV output."""
+    pq_path = _parquet_copy(csv_path)
+    return ("read_parquet(?)", str(pq_path)) if pq_path else ("read_csv(?)", str(csv_path))
+
+
+def _compact_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Categorical labels and downcast numerics; tables are only displayed and ranked."""
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    # float32 keeps ~7 significant digits, plenty for display/ranking, at half the memory.
+    # Sum emissions as float64 where totals are shown.
+    float_cols = df.select_dtypes("float64").columns
+    df[float_cols] = df[float_cols].astype(np.float32)
+    for col in df.select_dtypes("int64").columns:
+        df[col] = pd.to_numeric(df[col], downcast="integer")
+    return df
+
+
+def _mtime_ns(path: str) -> int:
+    """File modification time, folded into cache keys so regenerated tables invalidate."""
+    try:
+        return Path(path).stat().st_mtime_ns
+    except OSError:
+        return 0
+
 
-@st.cache_data(show_spinner=False)
 def load_csv(path: str) -> pd.DataFrame:
-    """Load a CSV with caching and friendly error handling."""
+    """Load a CSV with caching and friendly error handling.
+
+    A Parquet copy is kept next to the CSV so cold starts skip the text parse, and the
+    loaded frame is persisted to Streamlit's disk cache so it survives app restarts.
+    """
+    return _load_csv(path, _mtime_ns(path))
+
+
+@st.cache_data(show_spinner=False, persist="disk", max_entries=8)
+def _load_csv(path: str, mtime_ns: int) -> pd.DataFrame:
     try:
-        return pd.read_csv(path)
+        return _compact_dtypes(_read_via_parquet(Path(path)))
     except FileNotFoundError:
         st.warning(f"Missing file: {path}")
         return pd.DataFrame()
@@ -19,45 +115,114 @@ def add_geometry_type(df: pd.DataFrame) -> pd.DataFrame:
     """Annotate geometry type based on geometry_ref convention."""
     if "geometry_ref" not in df.columns:
         return df
-    def _type(ref: str) -> str:
-        if isinstance(ref, str) and ref.startswith("ghs-fua"):
-            return "Urban area (FUA)"
-        if isinstance(ref, str) and ref.startswith("gadm"):
-            return "Administrative region (GADM)"
-        return "Other/Unknown"
-    df = df.copy()
-    df["geometry_type"] = df["geometry_ref"].apply(_type)
-    return df
+    refs = df["geometry_ref"].astype("string")
+    geometry_type = np.select(
+        [refs.str.startswith(prefix, na=False) for prefix, _ in GEOMETRY_TYPES],
+        [label for _, label in GEOMETRY_TYPES],
+        default=OTHER_GEOMETRY_TYPE,
+    )
+    # assign returns a new frame, so the cached input is never mutated
+    return df.assign(geometry_type=pd.Categorical(geometry_type))
+
+
+def query_hotspots(
+    path: str,
+    country: Optional[str] = None,
+    clusters: Tuple[str, ...] = (),
+    geometry_types: Tuple[str, ...] = (),
+    res_range: Optional[Tuple[float, float]] = None,
+) -> pd.DataFrame:
+    """Filter a hotspot table in one DuckDB query, sorted by priority_score (DESC).
+
+    geometry_type is derived in the query. Cached on the file version and the scalar
+    filter values, so widget changes only rerun the SQL.
+    """
+    return _query_hotspots(path, _mtime_ns(path), country, clusters, geometry_types, res_range)
+
+
+@st.cache_data(show_spinner=False)
+def _query_hotspots(
+    path: str,
+    mtime_ns: int,
+    country: Optional[str],
+    clusters: Tuple[str, ...],
+    geometry_types: Tuple[str, ...],
+    res_range: Optional[Tuple[float, float]],
+) -> pd.DataFrame:
+    source_sql, source_path = _scan_sql(Path(path))
+    params = [source_path]
+
+    conditions = []
+    if country:
+        conditions.append("iso3_country = ?")
+        params.append(country)
+    if clusters:
+        conditions.append("list_contains(?, cluster_label)")
+        params.append(list(clusters))
+    if geometry_types:
+        conditions.append("list_contains(?, geometry_type)")
+        params.append(list(geometry_types))
+    if res_range is not None:
+        conditions.append("res_share BETWEEN ? AND ?")
+        params.extend(res_range)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    query = f"""
+        SELECT *
+        FROM (SELECT *, {_GEOMETRY_TYPE_SQL} AS geometry_type FROM {source_sql})
+        {where}
+        ORDER BY priority_score DESC NULLS LAST, geometry_ref
+    """
+    con = duckdb.connect()
+    try:
+        return _compact_dtypes(con.execute(query, params).df())
+    finally:
+        con.close()
 
 
 def format_large_number(x: float) -> str:
     """Human-friendly large number formatting for KPIs."""
-    try:
-        x = float(x)
-    except (TypeError, ValueError):
-        return "-"
-    if x >= 1_000_000_000:
-        return f"{x/1_000_000_000:.1f}B"
-    if x >= 1_000_000:
-        return f"{x/1_000_000:.1f}M"
-    if x >= 1_000:
-        return f"{x/1_000:.1f}K"
-    return f"{x:.0f}"
-
-
-def sidebar_filters_common(df: pd.DataFrame):
+    if not isinstance(x, float):
+        try:
+            x = float(x)
+        except (TypeError, ValueError):
+            return "-"
+    if not x >= 1_000:  # also catches NaN
+        return f"{x:.0f}"
+    i = min(int(math.log10(x)) // 3, 3) if x < math.inf else 3
+    if x < _SCALES[i]:  # log10 can round up just below a power of ten
+        i -= 1
+    return f"{x / _SCALES[i]:.1f}{_SUFFIXES[i]}"
+
+
+@st.cache_data(show_spinner=False)
+def _sidebar_options(path: str, mtime_ns: int) -> dict:
+    """Option lists for the shared filters; computed once per table version, not per rerun."""
+    df = add_geometry_type(load_csv(path))
+    return {
+        "countries": sorted(df["iso3_country"].dropna().unique()) if "iso3_country" in df else [],
+        "clusters": sorted(df["cluster_label"].dropna().unique()) if "cluster_label" in df else [],
+        "geometry_types": sorted(df["geometry_type"].dropna().unique()) if "geometry_type" in df else [],
+        "n_rows": len(df),
+    }
+
+
+def sidebar_filters_common(path: str):
     """Shared filters: country, cluster_label, geometry_type, res_share range, Top N."""
-    countries = sorted(df["iso3_country"].dropna().unique()) if "iso3_country" in df else []
+    options = _sidebar_options(path, _mtime_ns(path))
+
+    countries = options["countries"]
     country = st.sidebar.selectbox("Country (optional)", ["All"] + countries) if countries else "All"
 
-    cluster_labels = sorted(df["cluster_label"].dropna().unique()) if "cluster_label" in df else []
+    cluster_labels = options["clusters"]
     selected_clusters = st.sidebar.multiselect("Cluster label (optional)", cluster_labels) if cluster_labels else []
 
-    geometry_types = sorted(df["geometry_type"].dropna().unique()) if "geometry_type" in df else []
+    geometry_types = options["geometry_types"]
     geom_choice = st.sidebar.multiselect("Geometry type", geometry_types, default=geometry_types) if geometry_types else []
 
+    n_rows = options["n_rows"]
     res_min, res_max = st.sidebar.slider("Residential share range", 0.0, 1.0, (0.0, 1.0), step=0.05)
-    top_n = st.sidebar.slider("Top N", 10, 1000, 100 if len(df) > 100 else max(len(df), 10))
+    top_n = st.sidebar.slider("Top N", 10, 1000, 100 if n_rows > 100 else max(n_rows, 10))
 
     return {
         "country": None if country == "All" else country,
@@ -1,3 +1,9 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import duckdb
+
 from src.config import Paths
 from src.ingest import csv_to_parquet
 from src.analysis import rank_countries_countryfile
@@ -5,36 +11,59 @@ from src.eda import missing_value_summary
 from src.hotspots import aggregate_hotspots_by_geometry
 from src.hotspot_merge import merge_hotspot_tables
 from src.priority_score import compute_priority_scores
-from src.ml_hotspot_clustering import cluster_hotspots
-
-def process_file(paths: Paths, fname: str) -> None:
+from src.ml_hotspot_clustering import cluster_hotspots, attach_cluster_labels
+
+def duckdb_worker_config(n_heavy: int) -> dict:
+    # Split cores and DuckDB's default memory budget (80% of RAM) across the heavy ingests
+    # running at once. The small country files finish within seconds, so sharing by all
+    # workers would leave the multi-million-row files on a fraction of the cores afterwards.
+    n_heavy = max(1, n_heavy)
+    config = {"threads": max(1, (os.cpu_count() or 1) // n_heavy)}
+    try:
+        total_bytes = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return config  # no sysconf (e.g. Windows): keep DuckDB's default memory limit
+    config["memory_limit"] = f"{int(total_bytes * 0.8 / n_heavy) // 2**20}MB"
+    return config
+
+def process_file(paths: Paths, duckdb_config: dict, fname: str) -> None:
+    # Runs in a worker process: only reads `paths` and opens its own DuckDB connection,
+    # limited to this worker's share of threads and memory (duckdb_config)
+    print(f"Processing: {fname}")
     csv_path = paths.raw / fname
     pq_path = paths.processed / fname.replace(".csv", ".parquet")
 
     (paths.outputs / "tables").mkdir(parents=True, exist_ok=True)
     paths.processed.mkdir(parents=True, exist_ok=True)
 
-    # Ingest
-    if not pq_path.exists():
-        csv_to_parquet(csv_path, pq_path)
-        print(f"Parquet created: {pq_path}")
-    else:
-        print(f"Parquet exists, skipping ingest: {pq_path}")
-
-    # EDA always
-    eda_df = missing_value_summary(pq_path)
-    eda_out = paths.outputs / "tables" / f"eda_missing_{pq_path.stem}.csv"
-    eda_df.to_csv(eda_out, index=False)
-    print(f"Saved: {eda_out}")
-
-    # Ranking only for country emissions files
-    if "_country_emissions_" in fname:
-        ranking_df = rank_countries_countryfile(pq_path)
-        ranking_out = paths.outputs / "tables" / f"ranking_{pq_path.stem}.csv"
-        ranking_df.to_csv(ranking_out, index=False)
-        print(f"Saved: {ranking_out}")
-    else:
-        print("Skipping ranking (not a *_country_emissions_* file).")
+    # Ingest, EDA and ranking share one connection so DuckDB keeps the Parquet metadata cached
+    con = duckdb.connect(config=duckdb_config)
+    try:
+        con.execute("SET parquet_metadata_cache = true")
+
+        # Ingest (streams CSV -> Parquet inside DuckDB, no pandas materialization)
+        if not pq_path.exists():
+            csv_to_parquet(csv_path, pq_path, con=con)
+            print(f"Parquet created: {pq_path}")
+        else:
+            print(f"Parquet exists, skipping ingest: {pq_path}")
+
+        # EDA always
+        eda_df = missing_value_summary(pq_path, con=con)
+        eda_out = paths.outputs / "tables" / f"eda_missing_{pq_path.stem}.csv"
+        eda_df.to_csv(eda_out, index=False)
+        print(f"Saved: {eda_out}")
+
+        # Ranking only for country emissions files
+        if "_country_emissions_" in fname:
+            ranking_df = rank_countries_countryfile(pq_path, con=con)
+            ranking_out = paths.outputs / "tables" / f"ranking_{pq_path.stem}.csv"
+            ranking_df.to_csv(ranking_out, index=False)
+            print(f"Saved: {ranking_out}")
+        else:
+            print("Skipping ranking (not a *_country_emissions_* file).")
+    finally:
+        con.close()
 
 def generate_hotspots(paths: Paths) -> None:
     # Only emissions_sources files are aggregated for hotspots
@@ -49,7 +78,8 @@ def generate_hotspots(paths: Paths) -> None:
             print(f"Skipping hotspots (missing Parquet): {pq_path}")
             continue
 
-        hotspots_df = aggregate_hotspots_by_geometry(pq_path)
+        # Exact source counts: n_sources is published and feeds the clustering features
+        hotspots_df = aggregate_hotspots_by_geometry(pq_path, exact=True)
         out_path = paths.outputs / "tables" / out_name
         out_path.parent.mkdir(parents=True, exist_ok=True)
         hotspots_df.to_csv(out_path, index=False)
@@ -70,16 +100,21 @@ def generate_combined_hotspots(paths: Paths) -> None:
     combined_df.to_csv(out_path, index=False)
     print(f"Saved combined hotspots: {out_path}")
 
+    # Parquet copy for the downstream steps, so they load columns instead of re-parsing text
+    pq_out = out_path.with_suffix(".parquet")
+    combined_df.to_parquet(pq_out, index=False, compression="zstd")
+    print(f"Saved combined hotspots: {pq_out}")
+
 def generate_priority_scores(paths: Paths) -> None:
-    # Derive priority rankings from the merged hotspots CSV
-    input_csv = paths.outputs / "tables" / "hotspots_combined_geometry.csv"
-    if not input_csv.exists():
-        print("Skipping priority scores (missing combined hotspots CSV).")
+    # Derive priority rankings from the merged hotspots Parquet
+    input_pq = paths.outputs / "tables" / "hotspots_combined_geometry.parquet"
+    if not input_pq.exists():
+        print("Skipping priority scores (missing combined hotspots Parquet).")
         return
 
     global_out = paths.outputs / "tables" / "hotspots_priority_global.csv"
     compute_priority_scores(
-        combined_hotspots_csv=input_csv,
+        combined_hotspots_path=input_pq,
         output_csv=global_out,
         top_k_global=500,
         top_k_per_country=50,
@@ -89,15 +124,15 @@ def generate_priority_scores(paths: Paths) -> None:
 
 def run_hotspot_clustering(paths: Paths) -> None:
     # Cluster hotspots into archetypes to guide differentiated electrification strategies
-    input_csv = paths.outputs / "tables" / "hotspots_combined_geometry.csv"
-    if not input_csv.exists():
-        print("Skipping clustering (missing combined hotspots CSV).")
+    input_pq = paths.outputs / "tables" / "hotspots_combined_geometry.parquet"
+    if not input_pq.exists():
+        print("Skipping clustering (missing combined hotspots Parquet).")
         return
 
     clustered_out = paths.outputs / "tables" / "hotspots_clustered.csv"
     summary_out = paths.outputs / "tables" / "hotspots_cluster_summary.csv"
-    cluster_hotspots(
-        combined_hotspots_csv=input_csv,
+    clustered_df, _ = cluster_hotspots(
+        combined_hotspots_path=input_pq,
         output_clustered_csv=clustered_out,
         output_cluster_summary_csv=summary_out,
         k_min=3,
@@ -107,6 +142,17 @@ def run_hotspot_clustering(paths: Paths) -> None:
     print(f"Saved clustered hotspots: {clustered_out}")
     print(f"Saved cluster summary: {summary_out}")
 
+    # Pre-join cluster labels onto the priority tables so the app does not merge per page load;
+    # labels come from the in-memory clustered frame rather than re-reading its CSV
+    for name in ("hotspots_priority_global", "hotspots_priority_by_country"):
+        priority_csv = paths.outputs / "tables" / f"{name}.csv"
+        if not priority_csv.exists():
+            print(f"Skipping cluster labels (missing {priority_csv.name}).")
+            continue
+        labeled_out = paths.outputs / "tables" / f"{name}_with_cluster.csv"
+        attach_cluster_labels(priority_csv, clustered_df, labeled_out)
+        print(f"Saved priority scores with cluster labels: {labeled_out}")
+
 
 def main() -> None:
     paths = Paths()
@@ -121,10 +167,14 @@ def main() -> None:
         "residential-onsite-fuel-usage_emissions_sources_v4_7_1.csv",
     ]
 
-    for fname in files:
-        print("\n" + "=" * 80)
-        print(f"Processing: {fname}")
-        process_file(paths, fname)
+    # Files are independent until hotspot aggregation, so ingest/EDA them in parallel
+    print("\n" + "=" * 80)
+    print(f"Processing {len(files)} files in parallel")
+    n_workers = min(len(files), os.cpu_count() or 1)
+    # *_emissions_sources* files (incl. confidence) are the multi-million-row ingests
+    n_heavy = min(n_workers, sum("_emissions_sources" in fname for fname in files))
+    with ProcessPoolExecutor(max_workers=n_workers) as ex:
+        list(ex.map(partial(process_file, paths, duckdb_worker_config(n_heavy)), files))
 
     print("\n" + "=" * 80)
     print("Aggregating hotspots by geometry")
@@ -1,34 +1,40 @@
 from pathlib import Path
+from typing import Optional
 import duckdb
 import pandas as pd
 
-def missing_value_summary(parquet_path: Path) -> pd.DataFrame:
-    con = duckdb.connect()
 
-    # Get column names
-    cols = con.execute(
-        "DESCRIBE SELECT * FROM read_parquet(?)",
-        [str(parquet_path)]
-    ).df()["column_name"].tolist()
+def _quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
 
+
+def missing_value_summary(
+    parquet_path: Path,
+    con: Optional[duckdb.DuckDBPyConnection] = None,
+) -> pd.DataFrame:
+    own_con = con is None
+    if own_con:
+        con = duckdb.connect()
+
+    try:
+        # Register the Parquet once; the relation already carries the column names
+        rel = con.read_parquet(str(parquet_path))
+        cols = rel.columns
+
+        # Non-NULL counts for every column in a single scan; COUNT(col) skips NULLs natively
+        non_null_counts = ", ".join(f"COUNT({_quote_ident(col)})" for col in cols)
+        res = rel.query("src", f"SELECT COUNT(*), {non_null_counts} FROM src").fetchone()
+    finally:
+        if own_con:
+            con.close()
+
+    total_rows = res[0]
     rows = []
+    for col, non_null_rows in zip(cols, res[1:]):
+        missing_rows = total_rows - non_null_rows
+        pct_missing = round(100.0 * missing_rows / total_rows, 2) if total_rows else None
+        rows.append((col, total_rows, missing_rows, pct_missing))
 
-    for col in cols:
-        q = f"""
-        SELECT
-            '{col}' AS column_name,
-            COUNT(*) AS total_rows,
-            SUM(CASE WHEN {col} IS NULL THEN 1 ELSE 0 END) AS missing_rows,
-            ROUND(
-                100.0 * SUM(CASE WHEN {col} IS NULL THEN 1 ELSE 0 END) / COUNT(*),
-                2
-            ) AS pct_missing
-        FROM read_parquet(?)
-        """
-        res = con.execute(q, [str(parquet_path)]).fetchone()
-        rows.append(res)
-
-    con.close()
     return pd.DataFrame(
         rows,
         columns=["column_name", "total_rows", "missing_rows", "pct_missing"]
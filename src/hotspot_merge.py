@@ -1,7 +1,21 @@
 from pathlib import Path
+from typing import Tuple
+import numpy as np
 import pandas as pd
 
 
+def _combine_emissions(
+    res: np.ndarray,
+    nonres: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return (combined, res_share, nonres_share); shares are zero where combined is zero."""
+    combined = res + nonres
+    has_emissions = combined > 0
+    res_share = np.divide(res, combined, out=np.zeros_like(combined), where=has_emissions)
+    nonres_share = np.divide(nonres, combined, out=np.zeros_like(combined), where=has_emissions)
+    return combined, res_share, nonres_share
+
+
 def merge_hotspot_tables(
     residential_csv: Path,
     non_residential_csv: Path
@@ -35,45 +49,34 @@ def merge_hotspot_tables(
     )
 
     # Normalize numeric fields to numeric types and fill missing with zero
-    numeric_cols = [
-        "res_emissions",
-        "nonres_emissions",
-        "res_n_sources",
-        "nonres_n_sources",
-    ]
-    for col in numeric_cols:
+    for col in ["res_emissions", "nonres_emissions"]:
         merged[col] = pd.to_numeric(merged[col], errors="coerce").fillna(0)
+    # Source counts are integers; the outer join's NaNs would otherwise leave them float
+    for col in ["res_n_sources", "nonres_n_sources"]:
+        merged[col] = pd.to_numeric(merged[col], errors="coerce").fillna(0).astype(np.int64)
 
-    merged["combined_emissions"] = (
-        merged["res_emissions"] + merged["nonres_emissions"]
+    # Combined totals and safe shares computed on plain float64 arrays in one helper
+    combined, res_share, nonres_share = _combine_emissions(
+        merged["res_emissions"].to_numpy(dtype=np.float64),
+        merged["nonres_emissions"].to_numpy(dtype=np.float64),
     )
+    merged["combined_emissions"] = combined
+    merged["res_share"] = res_share
+    merged["nonres_share"] = nonres_share
     merged["combined_n_sources"] = (
         merged["res_n_sources"] + merged["nonres_n_sources"]
     )
 
-    # Safe share calculations; when combined_emissions is zero, set shares to zero
-    merged["res_share"] = merged["res_emissions"].where(
-        merged["combined_emissions"] > 0, 0
-    ) / merged["combined_emissions"].where(
-        merged["combined_emissions"] > 0, 1
+    # Latest end time per geometry across both datasets; coerce to datetime to compare.
+    # np.fmax skips NaT, so a geometry missing from one dataset keeps the other's time.
+    latest_dt = np.fmax(
+        pd.to_datetime(merged["res_latest_end_time"], errors="coerce").to_numpy("datetime64[ns]"),
+        pd.to_datetime(merged["nonres_latest_end_time"], errors="coerce").to_numpy("datetime64[ns]"),
     )
-    merged["nonres_share"] = merged["nonres_emissions"].where(
-        merged["combined_emissions"] > 0, 0
-    ) / merged["combined_emissions"].where(
-        merged["combined_emissions"] > 0, 1
+    merged["latest_end_time"] = (
+        pd.Series(latest_dt, index=merged.index).dt.strftime("%Y-%m-%dT%H:%M:%S").fillna("")
     )
 
-    # Latest end time per geometry across both datasets; coerce to datetime to compare
-    latest_dt = pd.concat(
-        [
-            pd.to_datetime(merged["res_latest_end_time"], errors="coerce"),
-            pd.to_datetime(merged["nonres_latest_end_time"], errors="coerce"),
-        ],
-        axis=1,
-    ).max(axis=1)
-    merged["latest_end_time"] = latest_dt.dt.strftime("%Y-%m-%dT%H:%M:%S")
-    merged["latest_end_time"] = merged["latest_end_time"].fillna("")
-
     ordered_cols = [
         "iso3_country",
         "geometry_ref",
@@ -1,25 +1,66 @@
+from functools import partial
 from pathlib import Path
-from typing import Tuple
+from typing import Callable, Tuple
 import numpy as np
 import pandas as pd
 from sklearn.cluster import KMeans
 from sklearn.metrics import silhouette_score
-from sklearn.preprocessing import StandardScaler
+from src.table_io import read_table, write_table
 
 
-def _select_k_silhouette(X: np.ndarray, k_min: int, k_max: int, random_state: int) -> Tuple[int, float]:
-    """Pick k with highest silhouette score in [k_min, k_max]."""
+def _sampled_silhouette(
+    X: np.ndarray,
+    labels: np.ndarray,
+    random_state: int,
+    sample_size: int = 10_000
+) -> float:
+    """
+    Silhouette score of labels, computed on a random subsample above sample_size rows.
+
+    Silhouette is O(n^2) in the number of points; the fixed seed keeps the same rows
+    for every call on the same X, so scores stay comparable across k.
+    """
+    silhouette_sample = sample_size if len(X) > sample_size else None
+    return silhouette_score(X, labels, sample_size=silhouette_sample, random_state=random_state)
+
+
+def _select_k_silhouette(
+    X: np.ndarray,
+    k_min: int,
+    k_max: int,
+    random_state: int,
+    model_factory: Callable[..., KMeans],
+    sample_size: int = 10_000,
+    early_stop: bool = False
+) -> Tuple[int, float]:
+    """
+    Pick k with highest silhouette score in [k_min, k_max].
+
+    model_factory(n_clusters=k) builds the estimator fitted for each candidate k; it should
+    be the same kind of model as the final fit, so the scores rank the k that gets published.
+    Scores use _sampled_silhouette (subsample of sample_size rows).
+
+    With early_stop, the search ends after two consecutive score decreases. That assumes the
+    silhouette is unimodal in k, which the real hotspot table breaks (k=3..10 scores 0.333,
+    0.352, 0.373, 0.390, 0.343, 0.353, 0.346, 0.353), so every k is scored by default.
+    """
+    n_samples = len(X)
     best_k = k_min
     best_score = -1.0
+    prev_score = None
+    n_decreases = 0
     for k in range(k_min, k_max + 1):
-        if k <= 1 or k >= len(X):
+        if k <= 1 or k >= n_samples:
             continue  # silhouette needs 2 <= k < n_samples
-        km = KMeans(n_clusters=k, n_init="auto", random_state=random_state)
-        labels = km.fit_predict(X)
-        score = silhouette_score(X, labels)
+        labels = model_factory(n_clusters=k).fit_predict(X)
+        score = _sampled_silhouette(X, labels, random_state, sample_size=sample_size)
         if score > best_score:
             best_score = score
             best_k = k
+        n_decreases = n_decreases + 1 if prev_score is not None and score < prev_score else 0
+        prev_score = score
+        if early_stop and n_decreases >= 2:
+            break
     # Fallback: if no valid k tried (very small dataset), default to k_min
     if best_score < 0:
         best_k = max(k_min, 2) if len(X) >= 2 else 1
@@ -27,71 +68,107 @@ def _select_k_silhouette(X: np.ndarray, k_min: int, k_max: int, random_state: in
     return best_k, best_score
 
 
-def _label_cluster(mean_res_share: float, median_emissions: float, overall_median: float) -> str:
+# Archetype labels indexed by 2*res_dominant + 4*nonres_heavy + high_emissions
+CLUSTER_LABELS = np.array([
+    "Mixed moderate",
+    "Mixed high",
+    "Residential-dominant moderate",
+    "Residential-dominant high",
+    "Non-residential heavy moderate",
+    "Non-residential heavy high",
+])
+
+
+def _label_clusters(
+    mean_res_share: np.ndarray,
+    median_emissions: np.ndarray,
+    overall_median: float
+) -> np.ndarray:
     """
-    Assign a human-readable label based on residential share and emissions magnitude.
+    Assign a human-readable label per cluster based on residential share and emissions magnitude.
     Simple deterministic rules to aid planning conversations.
     """
     high_emissions = median_emissions >= overall_median
-    if mean_res_share >= 0.8 and high_emissions:
-        return "Residential-dominant high"
-    if mean_res_share >= 0.8:
-        return "Residential-dominant moderate"
-    if mean_res_share <= 0.4 and high_emissions:
-        return "Non-residential heavy high"
-    if mean_res_share <= 0.4:
-        return "Non-residential heavy moderate"
-    if high_emissions:
-        return "Mixed high"
-    return "Mixed moderate"
+    res_dominant = mean_res_share >= 0.8
+    nonres_heavy = mean_res_share <= 0.4
+    code = 2 * res_dominant + 4 * nonres_heavy + high_emissions
+    return np.take(CLUSTER_LABELS, code)
 
 
 def cluster_hotspots(
-    combined_hotspots_csv: Path,
+    combined_hotspots_path: Path,
     output_clustered_csv: Path,
     output_cluster_summary_csv: Path,
     k_min: int = 3,
     k_max: int = 10,
-    random_state: int = 42
+    random_state: int = 42,
+    early_stop: bool = False
 ) -> Tuple[pd.DataFrame, pd.DataFrame]:
     """
     Cluster hotspots into archetypes using KMeans with silhouette-based k selection.
 
     Features: log emissions (total/res/nonres), res_share (clipped), and log sources.
+    Reads the merged hotspot table (.parquet preferred, .csv accepted).
+    early_stop ends the k search once the silhouette has fallen twice in a row (off by
+    default: see _select_k_silhouette).
     Returns (clustered_df, summary_df) and writes both CSVs for planning use.
     """
-    df = pd.read_csv(combined_hotspots_csv)
+    df = read_table(combined_hotspots_path)
 
     # Prepare numeric inputs; fill missing to keep robust on sparse data
     for col in [
         "combined_emissions",
         "res_emissions",
         "nonres_emissions",
-        "combined_n_sources",
         "res_share",
     ]:
-        df[col] = pd.to_numeric(df.get(col), errors="coerce").fillna(0)
-
-    df["res_share"] = df["res_share"].clip(0, 1)
-
-    features = pd.DataFrame({
-        "log_emissions": np.log1p(df["combined_emissions"]),
-        "res_share": df["res_share"],
-        "log_res_emissions": np.log1p(df["res_emissions"]),
-        "log_nonres_emissions": np.log1p(df["nonres_emissions"]),
-        "log_sources": np.log1p(df["combined_n_sources"]),
-    })
-
-    scaler = StandardScaler()
-    X = scaler.fit_transform(features)
-
-    # Select k by silhouette
-    k_selected, silhouette_selected = _select_k_silhouette(
-        X, k_min=k_min, k_max=k_max, random_state=random_state
+        df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0).to_numpy(np.float64)
+    # Source counts stay integer in the written table; only the feature is float
+    n_sources = pd.to_numeric(df["combined_n_sources"], errors="coerce").fillna(0).to_numpy(np.float64)
+
+    res_share = np.clip(df["res_share"].to_numpy(), 0, 1)
+    df["res_share"] = res_share
+
+    # Features written straight into one float32 buffer (no intermediate frame):
+    # log emissions, res_share, log res/nonres emissions, log sources.
+    # Row-major (C order), which is what KMeans validates for, so every fit uses this buffer as is.
+    X = np.empty((len(df), 5), dtype=np.float32)
+    np.log1p(df["combined_emissions"].to_numpy(), out=X[:, 0])
+    X[:, 1] = res_share
+    np.log1p(df["res_emissions"].to_numpy(), out=X[:, 2])
+    np.log1p(df["nonres_emissions"].to_numpy(), out=X[:, 3])
+    np.log1p(n_sources, out=X[:, 4])
+
+    # Standardize in place in float32: half the bytes of float64 and KMeans/silhouette
+    # run single-precision. The mean/std reductions accumulate in float64, since float32
+    # summation over the full table is order-sensitive enough to move hotspots between
+    # clusters. Constant columns keep scale 1, as StandardScaler does.
+    X -= X.mean(axis=0, dtype=np.float64)
+    std = X.std(axis=0, dtype=np.float64)
+    std[std == 0] = 1
+    X /= std
+
+    # Select k by silhouette. Candidates get a single elkan init each: the same algorithm as
+    # the final fit (so the chosen k matches a full search), minus the repeated restarts.
+    search_model = partial(KMeans, algorithm="elkan", n_init=1, random_state=random_state)
+    k_selected, search_silhouette = _select_k_silhouette(
+        X,
+        k_min=k_min,
+        k_max=k_max,
+        random_state=random_state,
+        model_factory=search_model,
+        early_stop=early_stop,
     )
 
-    kmeans = KMeans(n_clusters=k_selected, n_init="auto", random_state=random_state)
+    # One full fit for the winning k; elkan prunes distance computations on dense data
+    kmeans = KMeans(n_clusters=k_selected, algorithm="elkan", n_init=10, random_state=random_state)
     cluster_ids = kmeans.fit_predict(X)
+
+    # Report the silhouette of the published labels, not of the search fit
+    if 1 < k_selected < len(X):
+        silhouette_selected = _sampled_silhouette(X, cluster_ids, random_state)
+    else:
+        silhouette_selected = search_silhouette
     df["cluster_id"] = cluster_ids
     df["k_selected"] = k_selected
     df["silhouette_score_selected"] = silhouette_selected
@@ -111,25 +188,48 @@ def cluster_hotspots(
     summary["share_of_hotspots"] = summary["n_hotspots"] / len(df)
     summary["share_of_total_emissions"] = summary["sum_combined_emissions"] / max(overall_emissions, 1e-9)
 
-    summary["cluster_label"] = summary.apply(
-        lambda row: _label_cluster(
-            mean_res_share=row["mean_res_share"],
-            median_emissions=row["median_combined_emissions"],
-            overall_median=overall_median_emissions,
-        ),
-        axis=1,
+    summary["cluster_label"] = _label_clusters(
+        mean_res_share=summary["mean_res_share"].to_numpy(),
+        median_emissions=summary["median_combined_emissions"].to_numpy(),
+        overall_median=overall_median_emissions,
     )
 
-    # Attach labels back to full df
-    label_map = dict(zip(summary["cluster_id"], summary["cluster_label"]))
-    df["cluster_label"] = df["cluster_id"].map(label_map)
+    # Attach labels back to full df; cluster ids are 0..k-1, so look labels up by position
+    labels_by_id = np.empty(k_selected, dtype=object)
+    labels_by_id[summary["cluster_id"].to_numpy()] = summary["cluster_label"].to_numpy()
+    df["cluster_label"] = np.take(labels_by_id, cluster_ids)
 
     # Save outputs
-    output_clustered_csv.parent.mkdir(parents=True, exist_ok=True)
     df_sorted = df.sort_values("combined_emissions", ascending=False)
-    df_sorted.to_csv(output_clustered_csv, index=False)
+    write_table(df_sorted, output_clustered_csv)
 
     summary_sorted = summary.sort_values("share_of_total_emissions", ascending=False)
-    summary_sorted.to_csv(output_cluster_summary_csv, index=False)
+    write_table(summary_sorted, output_cluster_summary_csv)
 
     return df_sorted, summary_sorted
+
+
+def attach_cluster_labels(
+    priority_csv: Path,
+    cluster_labels: pd.DataFrame,
+    output_csv: Path
+) -> pd.DataFrame:
+    """
+    Left-join cluster_label onto a priority table on iso3_country + geometry_ref.
+
+    cluster_labels is the clustered frame returned by cluster_hotspots (only the join keys
+    and cluster_label are used), so the clustered CSV is not parsed back in.
+    Written once by the pipeline so the app can load ranked hotspots with their
+    archetype directly instead of merging on every page load.
+    """
+    priority_df = read_table(priority_csv)
+
+    df = pd.merge(
+        priority_df,
+        cluster_labels[["iso3_country", "geometry_ref", "cluster_label"]],
+        on=["iso3_country", "geometry_ref"],
+        how="left",
+    )
+
+    write_table(df, output_csv)
+    return df
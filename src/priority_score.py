@@ -1,10 +1,39 @@
 from pathlib import Path
+from typing import Optional
 import numpy as np
 import pandas as pd
+from src.table_io import read_table, write_table
+
+
+def _dense_rank_desc(values: np.ndarray, groups: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Dense rank (1 = largest) of values, restarting within each group id when given.
+
+    One sort pass: ranks step up wherever the sorted value (or the group) changes.
+    """
+    if groups is None:
+        _, inverse = np.unique(-values, return_inverse=True)
+        return inverse + 1
+
+    order = np.lexsort((-values, groups))
+    sorted_values = values[order]
+    sorted_groups = groups[order]
+
+    new_group = np.ones(len(order), dtype=bool)
+    new_group[1:] = sorted_groups[1:] != sorted_groups[:-1]
+    new_value = new_group.copy()
+    new_value[1:] |= sorted_values[1:] != sorted_values[:-1]
+
+    steps = np.cumsum(new_value)
+    group_start = np.maximum.accumulate(np.where(new_group, steps, 0))
+
+    ranks = np.empty(len(order), dtype=np.int64)
+    ranks[order] = steps - group_start + 1
+    return ranks
 
 
 def compute_priority_scores(
-    combined_hotspots_csv: Path,
+    combined_hotspots_path: Path,
     output_csv: Path,
     top_k_global: int = 500,
     top_k_per_country: int = 50
@@ -12,13 +41,14 @@ def compute_priority_scores(
     """
     Compute global and within-country priority scores for hotspot geometries.
 
+    combined_hotspots_path is the merged hotspot table (.parquet preferred, .csv accepted).
+
     Scores favor higher emissions and residential-heavy areas (via R multiplier).
     Writes two CSVs:
       - output_csv: top K globally by priority_score
       - <output_csv.parent>/hotspots_priority_by_country.csv: top K per country
+    Returns the full scored table in input order.
     """
-    df = pd.read_csv(combined_hotspots_csv)
-
     # Ensure numeric fields are usable; treat missing as zero
     numeric_cols = [
         "combined_emissions",
@@ -26,34 +56,45 @@ def compute_priority_scores(
         "nonres_emissions",
         "res_share",
     ]
+    df = read_table(
+        combined_hotspots_path,
+        columns=["iso3_country", "geometry_ref", *numeric_cols, "latest_end_time"],
+    )
     for col in numeric_cols:
-        df[col] = pd.to_numeric(df.get(col), errors="coerce").fillna(0)
+        df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0).to_numpy(np.float64)
 
-    # Clip residential share to valid bounds for the multiplier
-    df["res_share"] = df["res_share"].clip(lower=0, upper=1)
+    # Clip residential share to valid bounds for the multiplier. Column arrays are read-only
+    # under copy-on-write, so clip once and derive E and R from plain arrays.
+    res_share = np.clip(df["res_share"].to_numpy(), 0, 1)
+    df["res_share"] = res_share
 
-    R = 0.7 + 0.6 * df["res_share"]
-    E = np.log1p(df["combined_emissions"])
+    # Scoring deliberately stays in NumPy rather than one DuckDB window query: DuckDB has no
+    # log1p (ln(1 + x) shifts scores of sub-unit emissions), and a QUALIFY on dense rank
+    # returns more than K rows when scores tie, while the published tables are exactly top K.
+    R = 0.7 + 0.6 * res_share
+    E = np.log1p(df["combined_emissions"].to_numpy())
     df["priority_score"] = E * R
 
-    # Country-normalized score using min-max within each iso3_country
-    E_country = E
-    min_e = df.groupby("iso3_country")["combined_emissions"].transform(
-        lambda s: np.log1p(s.min())
-    )
-    max_e = df.groupby("iso3_country")["combined_emissions"].transform(
-        lambda s: np.log1p(s.max())
-    )
-    denom = (max_e - min_e).replace(0, np.nan)
-    df["priority_score_country"] = ((E_country - min_e) / denom).fillna(0) * R
+    # Integer country codes for every per-country step below, so the string keys are hashed
+    # once. sort=True makes code order match alphabetical country order.
+    country_codes, _ = pd.factorize(df["iso3_country"], sort=True)
+
+    # Country-normalized score using min-max within each iso3_country.
+    # log1p is monotonic, so min/max of E equal log1p of the raw min/max; the builtin
+    # reducers broadcast straight back to rows without a separate lookup.
+    gb = pd.Series(E, index=df.index).groupby(country_codes)
+    min_e = gb.transform("min")
+    max_e = gb.transform("max")
+    diff = (max_e - min_e).to_numpy()
+    denom = np.where(diff == 0, np.nan, diff)
+    df["priority_score_country"] = ((E - min_e) / denom).fillna(0) * R
 
     # Ranks (dense) for interpretability
-    df["priority_rank_global"] = df["priority_score"].rank(
-        method="dense", ascending=False
-    ).astype(int)
-    df["priority_rank_country"] = df.groupby("iso3_country")[
-        "priority_score_country"
-    ].rank(method="dense", ascending=False).astype(int)
+    df["priority_rank_global"] = _dense_rank_desc(df["priority_score"].to_numpy())
+    df["priority_rank_country"] = _dense_rank_desc(
+        df["priority_score_country"].to_numpy(),
+        groups=country_codes,
+    )
 
     ordered_cols = [
         "iso3_country",
@@ -70,20 +111,20 @@ def compute_priority_scores(
     ]
 
     df = df[ordered_cols]
-    df_sorted = df.sort_values("priority_score", ascending=False)
-
-    # Global top-K
-    global_top = df_sorted.head(top_k_global)
-    output_csv.parent.mkdir(parents=True, exist_ok=True)
-    global_top.to_csv(output_csv, index=False)
-
-    # Per-country top-K by country-normalized score
-    by_country = (
-        df.sort_values(["iso3_country", "priority_score_country"], ascending=[True, False])
-        .groupby("iso3_country")
-        .head(top_k_per_country)
-    )
+
+    # Global top-K: partial selection instead of sorting every row
+    global_top = df.nlargest(top_k_global, "priority_score")
+    write_table(global_top, output_csv)
+
+    # Per-country top-K by country-normalized score. Every row of a country's top K has
+    # dense rank <= K, so only that candidate set is sorted (ties can push it past K).
+    candidates = np.flatnonzero(df["priority_rank_country"].to_numpy() <= top_k_per_country)
+    order = candidates[np.lexsort((
+        -df["priority_score_country"].to_numpy()[candidates],
+        country_codes[candidates],
+    ))]
+    by_country = df.iloc[order].groupby(country_codes[order], sort=False).head(top_k_per_country)
     by_country_path = output_csv.parent / "hotspots_priority_by_country.csv"
-    by_country.to_csv(by_country_path, index=False)
+    write_table(by_country, by_country_path)
 
-    return df_sorted
+    return df
@@ -0,0 +1,62 @@
+from pathlib import Path
+from typing import Optional, Sequence
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pv
+
+# Kept as text so ISO codes and timestamps are written back exactly as they were read
+# (pyarrow would otherwise infer e.g. latest_end_time as a timestamp).
+_STRING_COLUMNS = ("iso3_country", "geometry_ref", "latest_end_time")
+
+
+def read_csv_arrow(
+    csv_path: Path,
+    columns: Optional[Sequence[str]] = None
+) -> pd.DataFrame:
+    """
+    Read a pipeline CSV with the multi-threaded Arrow parser into Arrow-backed columns.
+
+    columns restricts the read to those columns (missing ones raise).
+    """
+    convert_options = pv.ConvertOptions(
+        column_types={col: pa.string() for col in _STRING_COLUMNS},
+        include_columns=list(columns) if columns is not None else None,
+    )
+    table = pv.read_csv(csv_path, convert_options=convert_options)
+    return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+
+def read_table(
+    path: Path,
+    columns: Optional[Sequence[str]] = None
+) -> pd.DataFrame:
+    """
+    Read a pipeline table (.parquet or .csv) into Arrow-backed columns.
+
+    Parquet is preferred: columns are pruned at the reader and nothing is re-parsed.
+    """
+    if path.suffix == ".parquet":
+        return pd.read_parquet(
+            path,
+            engine="pyarrow",
+            columns=list(columns) if columns is not None else None,
+            dtype_backend="pyarrow",
+        )
+    return read_csv_arrow(path, columns=columns)
+
+
+def write_table(df: pd.DataFrame, path: Path) -> None:
+    """
+    Write a pipeline table as .parquet (ZSTD) or .csv, chosen by the file suffix.
+
+    CSVs are formatted by pyarrow's multi-threaded writer: string fields are quoted and
+    floats use the shortest round-trip digits, switching to exponent notation for very small
+    or large values (1.549515973987233e-8, 2.31473240195368e+10). Integral floats lose
+    their ".0", so a float column holding only whole numbers reads back as int64; keep
+    count columns integer-typed so that is deliberate.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix == ".parquet":
+        df.to_parquet(path, engine="pyarrow", compression="zstd", index=False)
+    else:
+        pv.write_csv(pa.Table.from_pandas(df, preserve_index=False), path)